@@ -160,9 +160,6 @@ class BDDManager(DDManager):
     def wmc_true(self, weights, semiring):
         return semiring.one()
 
-    def __del__(self):
-        pass
-
 
 @transform(LogicDAG, BDD)
 def build_bdd(source, destination, **kwdargs):
@@ -22,32 +22,57 @@ Provides access to Binary Decision Diagrams (BDDs).
     limitations under the License.
 """
 
+import importlib.util
+import operator
+import weakref
+
 from .core import transform
 from .dd_formula import DD, build_dd, DDManager
-from .errors import InstallError
+from .errors import InstallError, InvalidValue
+from .evaluator import SemiringProbability
 from .formula import LogicDAG
 
-# noinspection PyBroadException
-# noinspection PyUnresolvedReferences
-try:
-    # noinspection PyPackageRequirements
-    pass
-except Exception:
-    bdd = None
+# The dd library (dd.autoref) is only imported when the first BDD is created.
+bdd = None
+_bdd_available = None
+
+
+def _get_bdd():
+    """Import the dd library on first use.
 
-import dd.autoref as bdd
+    :return: the dd.autoref module
+    :raise InstallError: the library is not available
+    """
+    global bdd
+    if bdd is None:
+        # noinspection PyBroadException
+        try:
+            # noinspection PyPackageRequirements
+            import dd.autoref as bdd
+        except Exception:
+            raise InstallError("The BDD library is not available.")
+    return bdd
 
 
 class BDD(DD):
     """A propositional logic formula consisting of and, or, not and atoms represented as an BDD."""
 
-    def __init__(self, **kwdargs):
-        if bdd is None:
-            raise InstallError("The BDD library is not available.")
+    def __init__(self, var_order=None, **kwdargs):
+        """Create a new BDD.
+
+        :param var_order: keys of the atoms of the source formula, in the order their variables \
+            take in the BDD; the atoms that are not listed follow in the order of the source \
+            formula, so an empty list keeps that order. By default (None), the order is derived \
+            from the structure of the source formula.
+        :type var_order: list[int] | None
+        """
+        _get_bdd()
 
         DD.__init__(self, auto_compact=False, **kwdargs)
+        self.var_order = var_order
 
     def _create_manager(self):
+        # The order is only known in terms of manager labels once the source formula is known.
         return BDDManager()
 
     def get_atom_from_inode(self, node):
@@ -60,8 +85,13 @@ class BDD(DD):
 
     @classmethod
     def is_available(cls):
-        """Checks whether the BDD library is available."""
-        return bdd is not None
+        """Checks whether the BDD library is available (without importing it)."""
+        global _bdd_available
+        if _bdd_available is None:
+            _bdd_available = (
+                bdd is not None or importlib.util.find_spec("dd") is not None
+            )
+        return _bdd_available
 
 
 class BDDManager(DDManager):
@@ -70,18 +100,38 @@ class BDDManager(DDManager):
     It wraps around the pyeda BDD module
     """
 
+    # Maximal number of entries in each computed table.
+    computed_table_size = 1 << 20
+
     # noinspection PyUnusedLocal
-    def __init__(self, varcount=0, auto_gc=True):
+    def __init__(self, varcount=0, auto_gc=True, var_order=None, auto_reorder=False):
         """Create a new BDD manager.
 
         :param varcount: number of initial variables
         :type varcount: int
         :param auto_gc: use automatic garbage collection and minimization
         :type auto_gc: bool
+        :param var_order: labels of the variables to declare first, in order \
+            (the labels add_variable returns: the n-th new variable gets label n + 1)
+        :type var_order: list[int]
+        :param auto_reorder: use dynamic variable reordering (sifting) during construction
+        :type auto_reorder: bool
         """
         DDManager.__init__(self)
         self.varcount = 1
-        self.base = bdd.BDD()
+        self.base = _get_bdd().BDD()
+        self.base.configure(reordering=auto_reorder)
+        self.auto_reorder = auto_reorder
+        self.var2label = {}  # variable name in the BDD to label
+        self._literals = {}  # label to BDD node of the variable
+        self._conjoin_table = {}
+        self._disjoin_table = {}
+        self._cofactor_table = {}
+        self._pinned = {}  # node to reference count
+        self._flat_cache = {}  # id of root node to its linearized BDD
+        if var_order:
+            # Variables are placed at the next free level when declared.
+            self.declare(var_order)
         self.ZERO = self.base.false
         self.ONE = self.base.true
 
@@ -91,38 +141,101 @@ class BDDManager(DDManager):
             res = self.varcount
         else:
             res = label
-        self.base.declare("v" + str(res))
+        name = "v" + str(res)
+        if name not in self.var2label:
+            self.base.declare(name)
+            self.var2label[name] = res
         return res
 
+    def reserve(self, count):
+        """Declare the variables for the next labels in a single call.
+
+        :param count: number of variables that will be added
+        :type count: int
+        """
+        self.declare(range(self.varcount + 1, self.varcount + count + 1))
+
+    def declare(self, labels):
+        """Declare the variables with the given labels.
+
+        Variables are placed at the next free level, so this fixes the relative order
+        of the new variables. Variables that were already declared are ignored.
+
+        :param labels: labels of the variables
+        :type labels: collections.Iterable[int]
+        """
+        names = {}
+        for label in labels:
+            name = "v" + str(label)
+            if name not in self.var2label:
+                names[name] = label
+        self.base.declare(*names)
+        self.var2label.update(names)
+
     def get_variable(self, node):
         """Get the variable represented by the given node.
 
         :param node: internal node
         :return: original node
         """
-        # noinspection PyProtectedMember
-        return self.base.var(node)
+        return self.var2label[node.var]
 
     def literal(self, label):
-        return self.base.var("v" + str(self.add_variable(label)))
+        node = self._literals.get(label)
+        if node is None:
+            label = self.add_variable(label)
+            node = self.base.var("v" + str(label))
+            self._literals[label] = node
+        return node
 
     def is_true(self, node):
-        return node.is_one()
+        return node == self.ONE
 
     def true(self):
         return self.ONE
 
     def is_false(self, node):
-        return node.is_zero()
+        return node == self.ZERO
 
     def false(self):
         return self.ZERO
 
     def conjoin2(self, r, s):
-        return r & s
+        return self._apply_cached(self._conjoin_table, operator.and_, r, s)
 
     def disjoin2(self, r, s):
-        return r | s
+        return self._apply_cached(self._disjoin_table, operator.or_, r, s)
+
+    def _apply_cached(self, table, op, r, s):
+        """Apply a commutative operation, reusing the result of an earlier identical call."""
+        if id(r) > id(s):
+            r, s = s, r
+        key = (id(r), id(s))
+        entry = table.get(key)
+        if entry is None:
+            result = op(r, s)
+            self._remember(table, key, (r, s), result)
+            return result
+        return entry[1]
+
+    def _remember(self, table, key, nodes, value):
+        """Store a value computed from the given nodes in one of the manager's tables.
+
+        Tables are keyed on the ids of the nodes. The entry only holds weak references
+        to the nodes and is removed as soon as one of them is collected, so the table
+        does not keep dead nodes alive and an id cannot be reused while it is in use
+        as a key. Tables are bounded by :attr:`computed_table_size`; the oldest entry
+        is evicted first.
+        """
+        if self.computed_table_size <= 0:
+            return
+        if len(table) >= self.computed_table_size:
+            del table[next(iter(table))]
+
+        def discard(_, table=table, key=key):
+            table.pop(key, None)
+
+        table[key] = ([weakref.ref(n, discard) for n in nodes], value)
 
     def negate(self, node):
         return ~node
@@ -132,114 +245,153 @@ class BDDManager(DDManager):
         return node1 is node2
 
     def ref(self, *nodes):
-        pass
+        """Pin the given nodes, so gc does not reclaim them.
+
+        The caller owns the reference and has to release it with a matching call to deref.
+        A node that is never dereferenced stays pinned for the lifetime of the manager.
+
+        :param nodes: nodes to pin
+        """
+        pinned = self._pinned
+        for node in nodes:
+            pinned[node] = pinned.get(node, 0) + 1
 
     def deref(self, *nodes):
-        pass
+        """Release a reference obtained from ref or from an operation that returns a new node.
+
+        Dereferencing a node that is not pinned has no effect.
+
+        :param nodes: nodes to release
+        """
+        pinned = self._pinned
+        for node in nodes:
+            count = pinned.pop(node, 0)
+            if count > 1:
+                pinned[node] = count - 1
+
+    def gc(self):
+        """Free the nodes that are no longer referenced."""
+        self.base.collect_garbage()
+
+    def reorder(self):
+        """Minimize the size of the BDD by reordering its variables (Rudell's sifting)."""
+        bdd.reorder(self.base)
+        self._flat_cache.clear()
 
     def write_to_dot(self, node, filename):
         with open(filename, "w") as f:
             print(node.to_dot(), file=f)
 
-    def _parse_expr(self, expr):
-        # EXPR := VAR | "TRUE" | "FALSE" | ITE
-        # ITE := "ite" "(" VAR "," EXPR "," EXPR ")"
-        # VAR := expression
-        lexpr = len(expr)
-        if expr.startswith("TRUE"):
-            res = "TRUE"
-            pos = 4
-        elif expr.startswith("FALSE"):
-            res = "FALSE"
-            pos = 5
-        elif expr.startswith("ite("):
-            pos = 4
-            var, rst = expr[pos:].split(", ", 1)
-            ift, pos1 = self._parse_expr(rst)
-            iff, pos2 = self._parse_expr(rst[pos1:])
-            res = (var, ift, iff)
-            pos += pos1 + pos2 + len(var)
-        elif expr.startswith("(~ "):
-            pos = 3
-            sub, pos1 = self._parse_expr(expr[pos:])
-            pos = pos + pos1 + 1
-            res = ("~", sub)
+    def _flatten(self, node):
+        """Linearize the BDD rooted at the given node for evaluation.
+
+        Returns a list of ``(label, high, low)`` triples in post-order and the index of
+        the root. Indices refer to the position in the list of values computed so far,
+        where positions 0 and 1 hold the weights of false and true and position
+        ``i + 2`` holds the value of the ``i``-th triple.
+        Complemented edges are resolved during the traversal, so each entry is a
+        (regular node, polarity) pair.
+
+        The result is cached per node as long as the structure of the BDD cannot change,
+        that is, until the variables are reordered.
+        """
+        entry = self._flat_cache.get(id(node))
+        if entry is not None:
+            return entry[1]
+
+        one = self.ONE
+        var2label = self.var2label
+        order = []
+        if node.var is None:
+            root = 1 if node == one else 0
         else:
-            pos = 0
-            while pos < lexpr and expr[pos] not in " ,)":
-                pos += 1
-            res = expr[:pos]
-        while pos < lexpr and expr[pos] in " ,)":
-            pos += 1
-
-        return res, pos
-
-    def _enum_paths(self, expr, weights, semiring, negated=False):
-        if expr == "TRUE":
-            if not negated:
-                yield semiring.one()
-        elif expr == "FALSE":
-            if negated:
-                yield semiring.one()
-        elif type(expr) == str:
-            v = int(expr[1:])
-            wp, wn = weights[abs(v)]
-            if v > 0:
-                pass
-            else:
-                wp, wn = wn, wp
-            if negated:
-                yield wn
-            else:
-                yield wp
-        elif len(expr) == 3:
-            v = int(expr[0][1:])
-            wp, wn = weights[abs(v)]
-            if v > 0:
-                pass
-            else:
-                wp, wn = wn, wp
-
-            for p in self._enum_paths(expr[1], weights, semiring, negated=negated):
-                if negated:
-                    yield semiring.plus(wn, p)
+            index = {}
+            # Post-order traversal: a node is added once both children have an index.
+            stack = [(node, node.negated)]
+            while stack:
+                n, negated = stack[-1]
+                key = (abs(int(n)), negated)
+                if key in index:
+                    stack.pop()
+                    continue
+                high = n.high
+                if high.var is None:
+                    ih = 1 if (high == one) != negated else 0
                 else:
-                    yield semiring.times(wp, p)
-            for p in self._enum_paths(expr[2], weights, semiring, negated=negated):
-                if negated:
-                    yield semiring.plus(wp, p)
+                    hneg = negated != high.negated
+                    ih = index.get((abs(int(high)), hneg))
+                    if ih is None:
+                        stack.append((high, hneg))
+                low = n.low
+                if low.var is None:
+                    il = 1 if (low == one) != negated else 0
                 else:
-                    yield semiring.times(wn, p)
-        else:
-            if negated:
-                pall = semiring.one()
-            else:
-                pall = semiring.zero()
-            for p in self._enum_paths(expr[1], weights, semiring, negated=not negated):
-                if negated:
-                    pall = semiring.times(pall, p)
-                else:
-                    pall = semiring.plus(pall, p)
-            yield pall
+                    lneg = negated != low.negated
+                    il = index.get((abs(int(low)), lneg))
+                    if il is None:
+                        stack.append((low, lneg))
+                if ih is not None and il is not None:
+                    stack.pop()
+                    order.append((var2label[n.var], ih, il))
+                    index[key] = len(order) + 1
+            root = len(order) + 1
+
+        if not self.auto_reorder:
+            self._remember(self._flat_cache, id(node), (node,), (order, root))
+        return order, root
 
     def wmc(self, node, weights, semiring):
-        pall = semiring.zero()
+        if type(semiring) is SemiringProbability:
+            return self._wmc_probability(node, weights)
+
+        order, root = self._flatten(node)
+        plus = semiring.plus
+        times = semiring.times
+        values = [semiring.zero(), semiring.one()]
+        append = values.append
+        for label, high, low in order:
+            wp, wn = weights[label]
+            append(plus(times(wp, values[high]), times(wn, values[low])))
+        return values[root]
+
+    def _wmc_probability(self, node, weights):
+        """Weighted model count specialized for the probability semiring.
+
+        Same computation as :meth:`wmc`, but with plain float arithmetic instead of
+        calls to the semiring.
+        """
+        order, root = self._flatten(node)
+        values = [0.0, 1.0]
+        append = values.append
+        for label, high, low in order:
+            wp, wn = weights[label]
+            append(wp * values[high] + wn * values[low])
+        return values[root]
 
-        expr, _ = self._parse_expr(node.to_expr())
+    def wmc_literal(self, node, weights, semiring, literal):
+        """Compute the weight of the literal given the decision diagram.
 
-        for prob in self._enum_paths(expr, weights, semiring):
-            pall = semiring.plus(prob, pall)
-        return pall
+        This is computed as the weighted model count of the cofactor of the node with
+        respect to the literal, times the weight of the literal, normalized by the
+        weighted model count of the node.
+        """
+        key = (id(node), literal)
+        entry = self._cofactor_table.get(key)
+        if entry is None:
+            cofactor = self.base.let({"v" + str(abs(literal)): literal > 0}, node)
+            self._remember(self._cofactor_table, key, (node,), cofactor)
+        else:
+            cofactor = entry[1]
 
-    def wmc_literal(self, node, weights, semiring, literal):
-        raise NotImplementedError("not supported")
+        wp, wn = weights[abs(literal)]
+        result = semiring.times(
+            wp if literal > 0 else wn, self.wmc(cofactor, weights, semiring)
+        )
+        return semiring.normalize(result, self.wmc(node, weights, semiring))
 
     def wmc_true(self, weights, semiring):
         return semiring.one()
 
-    def __del__(self):
-        pass
-
 
 @transform(LogicDAG, BDD)
 def build_bdd(source, destination, **kwdargs):
@@ -250,4 +402,63 @@ def build_bdd(source, destination, **kwdargs):
     :param kwdargs: extra arguments
     :return: destination
     """
-    return build_dd(source, destination, **kwdargs)
+    manager = destination.get_manager()
+    manager.declare(
+        _variable_order(source, manager.varcount + 1, destination.var_order)
+    )
+    manager.reserve(source.atomcount)
+    build_dd(source, destination, **kwdargs)
+    manager.gc()
+    return destination
+
+
+def _variable_order(source, first_label, var_order=None):
+    """Order the variables of the given formula.
+
+    Without a given order, the variables are ordered by a depth-first traversal.
+    The traversal starts from the named nodes (queries, evidence, ...), so atoms that
+    occur together in a subformula end up close together in the order.
+    Atoms that are not reachable from a named node are placed at the end.
+
+    :param source: formula that will be compiled
+    :type source: LogicDAG
+    :param first_label: label the manager will assign to the first atom
+    :param var_order: keys of atoms of the source formula to place first, in order
+    :type var_order: list[int] | None
+    :return: labels of the variables in order
+    :rtype: list[int]
+    :raise InvalidValue: var_order contains a key that is not an atom of the formula
+    """
+    # build_dd adds the atoms in order, each atom taking the next label.
+    labels = {}
+    for i, n, t in source:
+        if t == "atom":
+            labels[i] = first_label + len(labels)
+
+    if var_order is not None:
+        order = []
+        for key in var_order:
+            label = labels.get(key)
+            if label is None:
+                raise InvalidValue("Not an atom of the formula: %s" % key)
+            order.append(label)
+        ordered = set(order)
+        order.extend(label for label in labels.values() if label not in ordered)
+        return order
+
+    order = []
+    visited = set()
+    stack = [abs(node) for _, node, _ in source.get_names_with_label() if node]
+    stack.reverse()
+    while stack:
+        index = stack.pop()
+        if index in visited:
+            continue
+        visited.add(index)
+        label = labels.get(index)
+        if label is None:
+            stack.extend(abs(c) for c in reversed(source.get_node(index).children))
+        else:
+            order.append(label)
+    order.extend(label for index, label in labels.items() if index not in visited)
+    return order
@@ -1,10 +1,30 @@
 import os
 from collections import defaultdict, namedtuple
+from itertools import chain
 
 from .errors import InvalidValue
 from .logic import *
 from .program import LogicProgram, PrologFile
-from .util import OrderedSet
+
+
+# Arguments of these predicates in which new variables are local to the call.
+_LOCAL_SCOPES = {"findall/3": (0, 1), "all/3": (0, 1), "all_or_none/3": (0, 1)}
+
+# Variables created for the variable placeholders of compiled clauses, by index.
+_VAR_POOL = {}
+
+
+def _node_type(name, fields, kind):
+    """Create a node class for the clause database.
+
+    :param name: name of the node type (used by the engine to dispatch on)
+    :param fields: field names of the node
+    :param kind: integer tag of the node type, available as ``kind`` on the class
+    :return: namedtuple class
+    """
+    cls = namedtuple(name, fields)
+    cls.kind = kind
+    return cls
 
 
 class ClauseDB(LogicProgram):
@@ -43,8 +63,21 @@ class ClauseDB(LogicProgram):
 
     """
 
-    _define = namedtuple("define", ("functor", "arity", "children", "location"))
-    _clause = namedtuple(
+    # Integer tags for the node types, stored as ``kind`` on each node class.
+    NODE_DEFINE = 0
+    NODE_CLAUSE = 1
+    NODE_FACT = 2
+    NODE_CALL = 3
+    NODE_DISJ = 4
+    NODE_CONJ = 5
+    NODE_NEG = 6
+    NODE_CHOICE = 7
+    NODE_EXTERN = 8
+
+    _define = _node_type(
+        "define", ("functor", "arity", "children", "location"), NODE_DEFINE
+    )
+    _clause = _node_type(
         "clause",
         (
             "functor",
@@ -56,19 +89,25 @@ class ClauseDB(LogicProgram):
             "group",
             "location",
         ),
+        NODE_CLAUSE,
+    )
+    _fact = _node_type(
+        "fact", ("functor", "args", "probability", "location"), NODE_FACT
     )
-    _fact = namedtuple("fact", ("functor", "args", "probability", "location"))
-    _call = namedtuple(
-        "call", ("functor", "args", "defnode", "location", "op_priority", "op_spec")
+    _call = _node_type(
+        "call",
+        ("functor", "args", "defnode", "location", "op_priority", "op_spec"),
+        NODE_CALL,
     )
-    _disj = namedtuple("disj", ("children", "location"))
-    _conj = namedtuple("conj", ("children", "location"))
-    _neg = namedtuple("neg", ("child", "location"))
-    _choice = namedtuple(
+    _disj = _node_type("disj", ("children", "location"), NODE_DISJ)
+    _conj = _node_type("conj", ("children", "location"), NODE_CONJ)
+    _neg = _node_type("neg", ("child", "location"), NODE_NEG)
+    _choice = _node_type(
         "choice",
         ("functor", "args", "probability", "locvars", "group", "choice", "location"),
+        NODE_CHOICE,
     )
-    _extern = namedtuple("extern", ("functor", "arity", "function"))
+    _extern = _node_type("extern", ("functor", "arity", "function"), NODE_EXTERN)
 
     FUNCTOR_CHOICE = "choice"
     FUNCTOR_BODY = "body"
@@ -77,6 +116,7 @@ class ClauseDB(LogicProgram):
         LogicProgram.__init__(self)
         self.__nodes = []  # list of nodes
         self.__heads = {}  # head.sig => node index
+        self.__define_clauses = {}  # define node index => clause index
 
         self.__builtins = builtins
 
@@ -84,12 +124,20 @@ class ClauseDB(LogicProgram):
         self.engine = None
 
         self.__parent = parent
-        self.__node_redirect = {}
+        # Redirects are kept fully resolved: they include those of the parents,
+        # so get_node needs a single lookup.
+        if parent is None:
+            self.__node_redirect = {}
+        else:
+            self.__node_redirect = dict(parent.__node_redirect)
         self.__extern = defaultdict(list)
 
         if parent is None:
             self.__offset = 0
+            # Resolved source files, shared with extensions. Failed lookups are not stored.
+            self.__source_file_cache = {}
         else:
+            self.__source_file_cache = parent.__source_file_cache
             if hasattr(parent, "line_info"):
                 self.line_info = parent.line_info
             if hasattr(parent, "source_files"):
@@ -97,8 +145,17 @@ class ClauseDB(LogicProgram):
             self.__offset = len(parent)
 
         self.dont_cache = set()
+        self.__extract_cache = {}
 
         self.queries = []
+
+        self._extract_handlers = [None] * 9
+        self._extract_handlers[self.NODE_FACT] = self._extract_fact
+        self._extract_handlers[self.NODE_CALL] = self._extract_call
+        self._extract_handlers[self.NODE_CONJ] = self._extract_conj
+        self._extract_handlers[self.NODE_DISJ] = self._extract_disj
+        self._extract_handlers[self.NODE_NEG] = self._extract_neg
+
         self._load_builtin_module()
 
     def _load_builtin_module(self):
@@ -116,9 +173,9 @@ class ClauseDB(LogicProgram):
 
     def update_data(self, key, value):
         if self.has_data(key):
-            if type(value) == list:
+            if isinstance(value, list):
                 self.data[key] += value
-            elif type(value) == dict:
+            elif isinstance(value, dict):
                 self.data[key].update(value)
             else:
                 raise TypeError("Can't update data of type '%s'" % type(value))
@@ -163,27 +220,29 @@ class ClauseDB(LogicProgram):
         return self._append_node(self._disj((op1, op2), location))
 
     def _scope_term(self, term, scope):
-        if term.signature in self.__builtins:
-            scope = None
-        if term.functor == "_directive":
-            scope = None
-        if scope is not None:
-            term.functor = "_%s_%s" % (scope, term.functor)
+        if scope is None:
             return term
-        else:
+        if self.__builtins is not None and term.signature in self.__builtins:
+            return term
+        if term.functor == "_directive":
             return term
+        term.functor = f"_{scope}_{term.functor}"
+        return term
 
     def _add_define_node(self, head, childnode):
         define_index = self._add_head(head)
-        define_node = self.get_node(define_index)
-        if not define_node:
-            clauses = self._create_index(head.arity)
-            self._set_node(
-                define_index,
-                self._define(head.functor, head.arity, clauses, head.location),
-            )
-        else:
-            clauses = define_node.children
+        clauses = self.__define_clauses.get(define_index)
+        if clauses is None:
+            define_node = self.get_node(define_index)
+            if not define_node:
+                clauses = self._create_index(head.arity)
+                self._set_node(
+                    define_index,
+                    self._define(head.functor, head.arity, clauses, head.location),
+                )
+            else:
+                clauses = define_node.children
+            self.__define_clauses[define_index] = clauses
         clauses.append(childnode)
         return childnode
 
@@ -247,10 +306,11 @@ class ClauseDB(LogicProgram):
         """
         index = self.__node_redirect.get(index, index)
 
-        if index < self.__offset:
-            return self.__parent.get_node(index)
-        else:
-            return self.__nodes[index - self.__offset]
+        db = self
+        while index < db.__offset:
+            # Walk up the chain of parents iteratively instead of recursing.
+            db = db.__parent
+        return db.__nodes[index - db.__offset]
 
     def _set_node(self, index, node):
         if index < self.__offset:
@@ -301,8 +361,7 @@ class ClauseDB(LogicProgram):
             # node exists in parent
             clauses = self._create_index(head.arity)
             if existing:
-                for c in existing.children:
-                    clauses.append(c)
+                clauses.extend(existing.children)
             old_node = node
             node = self._append_node(
                 self._define(head.functor, head.arity, clauses, head.location)
@@ -350,11 +409,10 @@ class ClauseDB(LogicProgram):
        :return: position of the definition node in the database
        :rtype: int
         """
-        # Count the number of variables in the fact
-        variables = _AutoDict()
-        term.apply(variables)
-        # If the fact has variables, threat is as a clause.
-        if len(variables) == 0:
+        # If the fact has variables, treat it as a clause.
+        if term.is_ground() and (
+            term.probability is None or term.probability.is_ground()
+        ):
             term = self._scope_term(term, scope)
             fact_node = self._append_node(
                 self._fact(term.functor, term.args, term.probability, term.location)
@@ -384,10 +442,7 @@ class ClauseDB(LogicProgram):
         self.__extern[scope].append(Term("'/'", Term(predicate), Constant(arity)))
 
     def get_local_scope(self, signature):
-        if signature in ("findall/3", "all/3", "all_or_none/3"):
-            return 0, 1
-        else:
-            return []
+        return _LOCAL_SCOPES.get(signature)
 
     def _compile(self, struct, variables=None, scope=None):
         """Compile the given structure and add it to the database.
@@ -402,167 +457,200 @@ class ClauseDB(LogicProgram):
         if variables is None:
             variables = _AutoDict()
 
-        if isinstance(struct, And):
-            op1 = self._compile(
-                struct.op1, variables, scope=scope
+        handler = self._compile_handlers.get(type(struct))
+        if handler is None:
+            handler = self._find_compile_handler(type(struct))
+            if handler is None:
+                raise ValueError("Unknown structure type: '%s'" % struct)
+        return handler(self, struct, variables, scope)
+
+    @classmethod
+    def _find_compile_handler(cls, struct_type):
+        """Look up the compile handler of a subclass of one of the known structures.
+
+        :param struct_type: type of the structure
+        :return: compile handler or None if the type is not supported
+        """
+        for base in struct_type.__mro__[1:]:
+            handler = cls._compile_handlers.get(base)
+            if handler is not None:
+                cls._compile_handlers[struct_type] = handler
+                return handler
+        return None
+
+    def _compile_binary(self, struct, variables, scope, add_node):
+        """Compile a conjunction or disjunction.
+
+        Conjunctions and disjunctions are parsed right-associative, so the right
+        spine of operators of the same type is unrolled iteratively.
+        The nodes are added in the same order as a recursive compilation would.
+        """
+        operands = []
+        while isinstance(struct.op2, type(struct)):
+            operands.append(self._compile(struct.op1, variables, scope=scope))
+            struct = struct.op2
+        operands.append(self._compile(struct.op1, variables, scope=scope))
+        result = self._compile(struct.op2, variables, scope=scope)
+        for op1 in reversed(operands):
+            result = add_node(op1, result)
+        return result
+
+    def _compile_and(self, struct, variables, scope):
+        return self._compile_binary(struct, variables, scope, self._add_and_node)
+
+    def _compile_or(self, struct, variables, scope):
+        return self._compile_binary(struct, variables, scope, self._add_or_node)
+
+    def _compile_not(self, struct, variables, scope):
+        variables.enter_local()
+        child = self._compile(struct.child, variables, scope=scope)
+        variables.exit_local()
+        return self._add_not_node(child, location=struct.location)
+
+    def _compile_ad(self, struct, variables, scope):
+        # Determine number of variables in the head
+        new_heads = [head.apply(variables) for head in struct.heads]
+
+        # Group id
+        group = len(self.__nodes)
+
+        # Create the body clause
+        body_node = self._compile(struct.body, variables, scope=scope)
+        body_count = len(variables)
+        # Body arguments
+        body_args = tuple(range(0, len(variables)))
+        body_functor = f"{self.FUNCTOR_BODY}_{len(self)}"
+        if len(new_heads) > 1:
+            heads_list = Term("multi")  # list2term(new_heads)
+        else:
+            heads_list = new_heads[0].with_probability(None)
+        body_head = Term(body_functor, Constant(group), heads_list, *body_args)
+        self._add_clause_node(
+            body_head, body_node, len(variables), variables.local_variables
+        )
+        clause_body = self._add_head(body_head)
+        for choice, head in enumerate(new_heads):
+            head = self._scope_term(head, scope)
+            # For each head: add choice node
+            choice_functor = Term(
+                self.FUNCTOR_CHOICE,
+                Constant(group),
+                Constant(choice),
+                head.with_probability(),
             )
-            op2 = self._compile(
-                struct.op2, variables, scope=scope
+            choice_node = self._add_choice_node(
+                choice,
+                choice_functor,
+                body_args,
+                head.probability,
+                variables.local_variables,
+                group,
+                head.location,
             )
-            return self._add_and_node(op1, op2)
-        elif isinstance(struct, Or):
-            op1 = self._compile(
-                struct.op1, variables, scope=scope
+            choice_call = self._append_node(
+                self._call(
+                    choice_functor,
+                    body_args,
+                    choice_node,
+                    head.location,
+                    None,
+                    None,
+                )
             )
-            op2 = self._compile(
-                struct.op2, variables, scope=scope
+            body_call = self._append_node(
+                self._call(
+                    body_functor,
+                    body_head.args,
+                    clause_body,
+                    head.location,
+                    None,
+                    None,
+                )
             )
-            return self._add_or_node(op1, op2)
-        elif isinstance(struct, Not):
-            variables.enter_local()
-            child = self._compile(
-                struct.child, variables, scope=scope
+            choice_body = self._add_and_node(body_call, choice_call)
+            self._add_clause_node(head, choice_body, body_count, {}, group=group)
+        return None
+
+    def _compile_clause(self, struct, variables, scope):
+        if struct.head.probability is not None:
+            return self._compile(
+                AnnotatedDisjunction([struct.head], struct.body),
+                scope=scope,
             )
-            variables.exit_local()
-            return self._add_not_node(child, location=struct.location)
-        elif isinstance(struct, Term) and struct.signature == "not/1":
+        else:
+            new_head = self._scope_term(
+                struct.head.apply(variables),
+                scope,
+            )
+            body_node = self._compile(
+                struct.body,
+                variables,
+                scope=scope,
+            )
+            return self._add_clause_node(
+                new_head, body_node, len(variables), variables.local_variables
+            )
+
+    def _compile_var(self, struct, variables, scope):
+        return self._add_call_node(
+            Term("call", struct.apply(variables), location=struct.location),
+            scope=scope,
+        )
+
+    def _compile_term(self, struct, variables, scope):
+        if struct.signature == "not/1":
             child = self._compile(
                 struct.args[0],
                 variables,
                 scope=scope,
             )
             return self._add_not_node(child, location=struct.location)
-        elif isinstance(struct, AnnotatedDisjunction):
-            # Determine number of variables in the head
-            new_heads = [head.apply(variables) for head in struct.heads]
-
-            # Group id
-            group = len(self.__nodes)
 
-            # Create the body clause
-            body_node = self._compile(
-                struct.body, variables, scope=scope
+        local_scope = self.get_local_scope(struct.signature)
+        if local_scope:
+            # Special case for findall: any variables added by the first
+            #  two arguments of findall are 'local' variables.
+            args = []
+            for i, a in enumerate(struct.args):
+                if i in local_scope:
+                    variables.enter_local()
+                if isinstance(a, Term):
+                    new_arg = a.apply(variables)
+                else:
+                    # For nested findalls: 'a' can be a raw variable pointer
+                    new_arg = variables[a]
+                if i in local_scope:
+                    variables.exit_local()
+                args.append(new_arg)
+            return self._add_call_node(
+                struct(*args), scope=scope
             )
-            body_count = len(variables)
-            # Body arguments
-            body_args = tuple(range(0, len(variables)))
-            body_functor = self.FUNCTOR_BODY + "_" + str(len(self))
-            if len(new_heads) > 1:
-                heads_list = Term("multi")  # list2term(new_heads)
-            else:
-                heads_list = new_heads[0].with_probability(None)
-            body_head = Term(body_functor, Constant(group), heads_list, *body_args)
-            self._add_clause_node(
-                body_head, body_node, len(variables), variables.local_variables
+        elif struct.functor in ("consult", "use_module"):
+            new_struct = Term(
+                "_" + struct.functor,
+                Term(scope),
+                *struct.args,
+                location=struct.location
             )
-            clause_body = self._add_head(body_head)
-            for choice, head in enumerate(new_heads):
-                head = self._scope_term(head, scope)
-                # For each head: add choice node
-                choice_functor = Term(
-                    self.FUNCTOR_CHOICE,
-                    Constant(group),
-                    Constant(choice),
-                    head.with_probability(),
-                )
-                choice_node = self._add_choice_node(
-                    choice,
-                    choice_functor,
-                    body_args,
-                    head.probability,
-                    variables.local_variables,
-                    group,
-                    head.location,
-                )
-                choice_call = self._append_node(
-                    self._call(
-                        choice_functor,
-                        body_args,
-                        choice_node,
-                        head.location,
-                        None,
-                        None,
-                    )
-                )
-                body_call = self._append_node(
-                    self._call(
-                        body_functor,
-                        body_head.args,
-                        clause_body,
-                        head.location,
-                        None,
-                        None,
-                    )
-                )
-                choice_body = self._add_and_node(body_call, choice_call)
-                self._add_clause_node(head, choice_body, body_count, {}, group=group)
-            return None
-        elif isinstance(struct, Clause):
-            if struct.head.probability is not None:
-                return self._compile(
-                    AnnotatedDisjunction([struct.head], struct.body),
-                    scope=scope,
-                )
-            else:
-                new_head = self._scope_term(
-                    struct.head.apply(variables),
-                    scope,
-                )
-                body_node = self._compile(
-                    struct.body,
-                    variables,
-                    scope=scope,
-                )
-                return self._add_clause_node(
-                    new_head, body_node, len(variables), variables.local_variables
-                )
-        elif isinstance(struct, Var):
             return self._add_call_node(
-                Term("call", struct.apply(variables), location=struct.location),
+                new_struct.apply(variables),
                 scope=scope,
             )
-        elif isinstance(struct, Term):
-            local_scope = self.get_local_scope(struct.signature)
-            if local_scope:
-                # Special case for findall: any variables added by the first
-                #  two arguments of findall are 'local' variables.
-                args = []
-                for i, a in enumerate(struct.args):
-                    if not isinstance(a, Term):
-                        # For nested findalls: 'a' can be a raw variable pointer
-                        # Temporarily wrap it in a Term, so we can call 'apply' on it.
-                        a = Term("_", a)
-                    if i in local_scope:
-                        variables.enter_local()
-                        new_arg = a.apply(variables)
-                        variables.exit_local()
-                    else:
-                        new_arg = a.apply(variables)
-                    if a.functor == "_":
-                        # If the argument was temporarily wrapped: unwrap it.
-                        new_arg = new_arg.args[0]
-                    args.append(new_arg)
-                return self._add_call_node(
-                    struct(*args), scope=scope
-                )
-            elif struct.functor in ("consult", "use_module"):
-                new_struct = Term(
-                    "_" + struct.functor,
-                    Term(scope),
-                    *struct.args,
-                    location=struct.location
-                )
-                return self._add_call_node(
-                    new_struct.apply(variables),
-                    scope=scope,
-                )
-            else:
-                return self._add_call_node(
-                    struct.apply(variables),
-                    scope=scope,
-                )
         else:
-            raise ValueError("Unknown structure type: '%s'" % struct)
+            return self._add_call_node(
+                struct.apply(variables),
+                scope=scope,
+            )
+
+    _compile_handlers = {
+        And: _compile_and,
+        Or: _compile_or,
+        Not: _compile_not,
+        AnnotatedDisjunction: _compile_ad,
+        Clause: _compile_clause,
+        Var: _compile_var,
+        Term: _compile_term,
+    }
 
     def _create_ints(self, term):
         """
@@ -589,7 +677,15 @@ class ClauseDB(LogicProgram):
 
     def _create_vars(self, term):
         if type(term) == int:
-            return Var("V_" + str(term))
+            var = _VAR_POOL.get(term)
+            if var is None:
+                var = _VAR_POOL[term] = Var("V_" + str(term))
+            return var
+        elif term.is_ground() and (
+            term.probability is None or is_ground(term.probability)
+        ):
+            # No variable placeholders: nothing to rebuild.
+            return term
         else:
             args = [self._create_vars(arg) for arg in term.args]
             term = term.with_args(*args)
@@ -598,58 +694,77 @@ class ClauseDB(LogicProgram):
             return term
 
     def _extract(self, node_id):
+        # Body nodes are never modified once added, so their terms can be reused.
+        result = self.__extract_cache.get(node_id)
+        if result is not None:
+            return result
+
         node = self.get_node(node_id)
         if not node:
             raise ValueError("Unexpected empty node.")
 
-        nodetype = type(node).__name__
-        if nodetype == "fact":
-            return Term(node.functor, *node.args, p=node.probability)
-        elif nodetype == "call":
-            func = node.functor
-            args = node.args
-            if isinstance(func, Term):
-                return self._create_vars(func(*(func.args + args)))
-            else:
-                return self._create_vars(
-                    Term(func, *args, priority=node.op_priority, opspec=node.op_spec)
-                )
-        elif nodetype == "conj":
-            a, b = node.children
-            return And(self._extract(a), self._extract(b))
-        elif nodetype == "disj":
-            a, b = node.children
-            return Or(self._extract(a), self._extract(b))
-        elif nodetype == "neg":
-            return Not("\\+", self._extract(node.child))
+        handler = self._extract_handlers[node.kind]
+        if handler is None:
+            raise ValueError("Unknown node type: '%s'" % type(node).__name__)
+        result = handler(node)
+        self.__extract_cache[node_id] = result
+        return result
+
+    def _extract_fact(self, node):
+        return Term(node.functor, *node.args, p=node.probability)
+
+    def _extract_call(self, node):
+        func = node.functor
+        args = node.args
+        if isinstance(func, Term):
+            return self._create_vars(func(*(func.args + args)))
         else:
-            raise ValueError("Unknown node type: '%s'" % nodetype)
+            return self._create_vars(
+                Term(func, *args, priority=node.op_priority, opspec=node.op_spec)
+            )
+
+    def _extract_conj(self, node):
+        a, b = node.children
+        return And(self._extract(a), self._extract(b))
+
+    def _extract_disj(self, node):
+        a, b = node.children
+        return Or(self._extract(a), self._extract(b))
+
+    def _extract_neg(self, node):
+        return Not("\\+", self._extract(node.child))
 
     def to_clause(self, index):
         node = self.get_node(index)
-        nodetype = type(node).__name__
-        if nodetype == "fact":
+        if not node:
+            return None
+        kind = node.kind
+        if kind == self.NODE_FACT:
             return Term(node.functor, *node.args, p=node.probability)
-        elif nodetype == "clause":
+        elif kind == self.NODE_CLAUSE:
             head = self._create_vars(Term(node.functor, *node.args, p=node.probability))
             return Clause(head, self._extract(node.child))
 
     def __iter__(self):
-        clause_groups = defaultdict(list)
+        clause_groups = None  # only created when the program has AD groups
         for index, node in self.enum_nodes():
             if not node:
                 continue
-            nodetype = type(node).__name__
-            if nodetype == "fact":
+            kind = node.kind
+            if kind == self.NODE_FACT:
                 yield Term(node.functor, *node.args, p=node.probability)
-            elif nodetype == "clause":
+            elif kind == self.NODE_CLAUSE:
                 if node.group is None:
                     head = self._create_vars(
                         Term(node.functor, *node.args, p=node.probability)
                     )
                     yield Clause(head, self._extract(node.child))
                 else:
+                    if clause_groups is None:
+                        clause_groups = defaultdict(list)
                     clause_groups[node.group].append(index)
+        if clause_groups is None:
+            return
         for group in clause_groups.values():
             heads = []
             body = None
@@ -671,14 +786,14 @@ class ClauseDB(LogicProgram):
          without annotated disjunctions.
         """
 
-        clause_groups = defaultdict(list)
+        clause_groups = None  # only created when the program has AD groups
         for index, node in self.enum_nodes():
             if not node:
                 continue
-            nodetype = type(node).__name__
-            if nodetype == "fact":
+            kind = node.kind
+            if kind == self.NODE_FACT:
                 yield Term(node.functor, *node.args, p=node.probability)
-            elif nodetype == "clause":
+            elif kind == self.NODE_CLAUSE:
                 if node.group is None:
                     head = self._create_vars(
                         Term(node.functor, *node.args, p=node.probability)
@@ -687,12 +802,16 @@ class ClauseDB(LogicProgram):
                 else:
                     head = self._create_vars(Term(node.functor, *node.args))
                     yield Clause(head, self._extract(node.child))
-            elif nodetype == "choice":
+            elif kind == self.NODE_CHOICE:
                 group = node.functor.args[0]
                 c = node.functor(*(node.functor.args + node.args))
+                if clause_groups is None:
+                    clause_groups = defaultdict(list)
                 clause_groups[group].append(c)
                 yield c.with_probability(node.probability)
 
+        if clause_groups is None:
+            return
         for group in clause_groups.values():
             if len(group) > 1:
                 yield Term("mutual_exclusive", list2term(group))
@@ -706,14 +825,16 @@ class ClauseDB(LogicProgram):
             from . import library_paths
 
             libname = unquote(str(filename.args[0]))
+            key = (libname, tuple(library_paths))
+            existing = self.__source_file_cache.get(key)
+            if existing is not None:
+                return existing
             for path in library_paths:
                 filename = os.path.join(path, libname)
-                if os.path.exists(filename):
-                    return filename
-                elif os.path.exists(filename + ".pl"):
-                    return filename + ".pl"
-                elif os.path.exists(filename + ".py"):
-                    return filename + ".py"
+                existing = _find_source_file(filename)
+                if existing is not None:
+                    self.__source_file_cache[key] = existing
+                    return existing
         else:
             root = self.source_root
             if hasattr(filename, "location") and filename.location:
@@ -722,12 +843,14 @@ class ClauseDB(LogicProgram):
                     root = os.path.dirname(source_root)
 
             filename = os.path.join(root, unquote(str(filename)))
-            if os.path.exists(filename):
-                return filename
-            elif os.path.exists(filename + ".pl"):
-                return filename + ".pl"
-            elif os.path.exists(filename + ".py"):
-                return filename + ".py"
+            key = os.path.abspath(filename)
+            existing = self.__source_file_cache.get(key)
+            if existing is not None:
+                return existing
+            existing = _find_source_file(filename)
+            if existing is not None:
+                self.__source_file_cache[key] = existing
+                return existing
         return filename
 
     def create_function(self, functor, arity):
@@ -739,20 +862,23 @@ class ClauseDB(LogicProgram):
         """
         return PrologFunction(self, functor, arity)
 
+    def _chain(self):
+        """List the databases from the root to this one."""
+        chain = []
+        db = self
+        while db is not None:
+            chain.append(db)
+            db = db.__parent
+        chain.reverse()
+        return chain
+
     def enum_nodes(self):
-        if self.__parent:
-            for i, n in self.__parent.enum_nodes():
-                yield i, n
-        for i, n in enumerate(self.__nodes):
-            i += self.__offset
-            yield i, n
+        for db in self._chain():
+            yield from enumerate(db.__nodes, db.__offset)
 
     def iter_nodes(self):
-        if self.__parent:
-            for n in self.__parent.iter_nodes():
-                yield n
-        for n in self.__nodes:
-            yield n
+        for db in self._chain():
+            yield from db.__nodes
 
     def consult(self, filename, location=None, my_scope=None):
         filename = self.resolve_filename(filename)
@@ -828,7 +954,7 @@ class ClauseDB(LogicProgram):
                     if mp not in preds:
                         self._create_alias(mp, module_name, my_scope=my_scope)
             else:
-                preds = {}
+                exported = set(module_predicates)
                 for pred in term2list(predicates):
                     if pred.functor == "'as'":
                         mp = pred.args[0]
@@ -836,7 +962,7 @@ class ClauseDB(LogicProgram):
                     else:
                         mp = pred
                         rename = pred.args[0]
-                    if mp in module_predicates:
+                    if mp in exported:
                         self._create_alias(
                             mp, module_name, rename=rename, my_scope=my_scope
                         )
@@ -854,14 +980,9 @@ class ClauseDB(LogicProgram):
             rename = pred.args[0]
 
         if scope is not None:
-            root_sign = self._scope_term(
-                Term(rename, *[None] * int(pred.args[1])),
-                my_scope,
-            )
-            scoped_sign = self._scope_term(
-                Term(pred.args[0], *[None] * int(pred.args[1])),
-                scope,
-            )
+            args = (None,) * int(pred.args[1])
+            root_sign = self._scope_term(Term(rename, *args), my_scope)
+            scoped_sign = self._scope_term(Term(pred.args[0], *args), scope)
 
             rh = self._add_head(root_sign, create=False)
             sh = self._add_head(scoped_sign, create=False)
@@ -891,6 +1012,23 @@ class ClauseDB(LogicProgram):
         return module_name, self.__extern[module_name]
 
 
+def _find_source_file(filename):
+    """Find the source file for the given path, trying the extensions .pl and .py.
+
+    :param filename: path of the file, with or without extension
+    :type filename: str
+    :return: path of the existing file, or None if there is no such file
+    :rtype: str | None
+    """
+    if os.path.exists(filename):
+        return filename
+    elif os.path.exists(filename + ".pl"):
+        return filename + ".pl"
+    elif os.path.exists(filename + ".py"):
+        return filename + ".py"
+    return None
+
+
 class ConsultError(GroundingError):
     """Error during consult"""
 
@@ -935,10 +1073,12 @@ class AccessError(GroundingError):
 
 
 class _AutoDict(dict):
+    __slots__ = ("__record", "__size", "__localmode", "local_variables")
+
     def __init__(self):
         dict.__init__(self)
         self.__record = set()
-        self.__anon = 0
+        self.__size = 0  # number of variables, including anonymous ones
         self.__localmode = False
         self.local_variables = set()
 
@@ -949,22 +1089,23 @@ class _AutoDict(dict):
         self.__localmode = False
 
     def __getitem__(self, key):
-        if key == "_" and self.__localmode:
+        localmode = self.__localmode
+        if key == "_" and localmode:
             key = "_#%s" % len(self.local_variables)
 
         if key == "_" or key is None:
-
-            value = len(self)
-            self.__anon += 1
+            value = self.__size
+            self.__size += 1
             return value
         else:
             value = self.get(key)
             if value is None:
-                value = len(self)
-                self[key] = value
-                if self.__localmode:
+                value = self.__size
+                self.__size += 1
+                dict.__setitem__(self, key, value)
+                if localmode:
                     self.local_variables.add(value)
-            elif not self.__localmode and value in self.local_variables:
+            elif not localmode and value in self.local_variables:
                 # Variable initially defined in local scope is reused outside local scope.
                 # This means it's not local anymore.
                 self.local_variables.remove(value)
@@ -972,7 +1113,7 @@ class _AutoDict(dict):
             return value
 
     def __len__(self):
-        return dict.__len__(self) + self.__anon
+        return self.__size
 
     def usedVars(self):
         result = set(self.__record)
@@ -981,8 +1122,8 @@ class _AutoDict(dict):
 
     def define(self, key):
         if key not in self:
-            value = len(self)
-            self[key] = value
+            dict.__setitem__(self, key, self.__size)
+            self.__size += 1
 
 
 def intersection(l1, l2):
@@ -1005,50 +1146,104 @@ def intersection(l1, l2):
 
 
 class ClauseIndex(list):
+    __slots__ = ("__parent", "__index", "__position", "__erased", "__cache")
+
+    # Maximal number of lookups of which the result is kept.
+    cache_size = 4096
+
     def __init__(self, parent, arity):
         list.__init__(self)
         self.__parent = parent
-        self.__basetype = OrderedSet
-        self.__index = [defaultdict(self.__basetype) for _ in range(0, arity)]
-        self.__optimized = False
+        # Buckets are dicts used as insertion-ordered sets of clause nodes.
+        self.__index = [defaultdict(dict) for _ in range(0, arity)]
+        self.__position = {}  # item => position in the list
         self.__erased = set()
+        self.__cache = {}  # ground arguments (None for variables) => clause nodes
 
     def find(self, arguments):
-        results = None
+        # For each ground argument: the clauses with the same value in that position
+        # and the clauses with a variable in that position.
+        restrictions = []
+        key = []
         for i, arg in enumerate(arguments):
-            if not is_ground(arg):
-                pass  # Variable => no restrictions
+            if is_ground(arg):  # Variable => no restrictions
+                index = self.__index[i]
+                curr = index.get(arg, ())
+                none = index.get(None, ())
+                if not curr and not none:
+                    return []
+                restrictions.append((len(curr) + len(none), curr, none))
+                key.append(arg)
             else:
-                curr = self.__index[i].get(arg)
-                none = self.__index[i].get(None, self.__basetype())
-                if curr is None:
-                    curr = none
-                else:
-                    curr |= none
-
-                if results is None:  # First argument with restriction
-                    results = curr
-                else:
-                    results = results & curr  # for some reason &= doesn't work here
-            if results is not None and not results:
-                return []
-        if results is None:
+                key.append(None)
+        if not restrictions:
             if self.__erased:
-                return OrderedSet(self) - self.__erased
+                erased = self.__erased
+                return [item for item in self if item not in erased]
             else:
                 return self
+
+        erased = self.__erased
+        if len(restrictions) == 1 and not erased:
+            _, curr, none = restrictions[0]
+            if not none:
+                return curr
+            elif not curr:
+                return none
+
+        # The result has to be computed: reuse it if this lookup was done before.
+        key = tuple(key)
+        cache = self.__cache
+        result = cache.get(key)
+        if result is not None:
+            return result
+
+        # Start from the most selective argument and check the others per clause.
+        restrictions.sort(key=lambda r: r[0])
+        _, curr, none = restrictions[0]
+        if not none:
+            candidates = curr
+        elif not curr:
+            candidates = none
         else:
-            if self.__erased:
-                return results - self.__erased
-            else:
-                return results
+            candidates = sorted(chain(curr, none), key=self.__position.__getitem__)
+        others = restrictions[1:]
+        result = [
+            item
+            for item in candidates
+            if item not in erased
+            and all(item in curr or item in none for _, curr, none in others)
+        ]
+        if len(cache) >= self.cache_size:
+            del cache[next(iter(cache))]
+        cache[key] = result
+        return result
 
     def _add(self, key, item):
         for i, k in enumerate(key):
-            self.__index[i][k].add(item)
+            self.__index[i][k][item] = None
 
     def append(self, item):
         list.append(self, item)
+        self._index_item(item)
+        self.__cache.clear()
+
+    def extend(self, items):
+        """Add several clauses to the index at once.
+
+        :param items: node indices of the clauses
+        """
+        start = len(self)
+        list.extend(self, items)
+        for item in self[start:]:
+            self._index_item(item)
+        self.__cache.clear()
+
+    def _index_item(self, item):
+        if not self.__index:
+            # Atoms have no arguments to index on: find always returns all clauses.
+            return
+        self.__position.setdefault(item, len(self.__position))
         key = []
         try:
             args = self.__parent.get_node(item).args
@@ -1063,3 +1258,4 @@ class ClauseIndex(list):
 
     def erase(self, items):
         self.__erased |= set(items)
+        self.__cache.clear()
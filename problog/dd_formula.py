@@ -86,8 +86,9 @@ class DD(LogicFormula, EvaluatableDSP):
             result = mgr.literal(self.atom2var[index])
         else:
             # Extend list
-            while len(mgr.nodes) < index:
-                mgr.nodes.append(None)
+            missing = index - len(mgr.nodes)
+            if missing > 0:
+                mgr.nodes.extend([None] * missing)
             result = mgr.nodes[index - 1]
             if result is None:
                 result = self._create_inode(node)
@@ -273,13 +274,16 @@ class DDManager(object):
         for garbage collection, and the output node has a reference count greater than one.
         Reference count on input nodes is not touched (unless one of the inputs becomes the output).
         """
-        r = self.true()
         for s in nodes:
-            r1 = self.conjoin2(r, s)
-            self.ref(r1)
-            self.deref(r)
-            r = r1
-        return r
+            if self.is_false(s):
+                # The conjunction is false: no need to combine the other nodes.
+                self.ref(s)
+                return s
+        # True nodes do not change the conjunction.
+        nodes = [s for s in nodes if not self.is_true(s)] or nodes[:1]
+        if not nodes:
+            return self.true()
+        return self._reduce(self.conjoin2, nodes)
 
     def disjoin(self, *nodes):
         """Create the disjunction of the given nodes.
@@ -291,13 +295,49 @@ class DDManager(object):
         for garbage collection, and the output node has a reference count greater than one.
         Reference count on input nodes is not touched (unless one of the inputs becomes the output).
         """
-        r = self.false()
         for s in nodes:
-            r1 = self.disjoin2(r, s)
-            self.ref(r1)
-            self.deref(r)
-            r = r1
-        return r
+            if self.is_true(s):
+                # The disjunction is true: no need to combine the other nodes.
+                self.ref(s)
+                return s
+        # False nodes do not change the disjunction.
+        nodes = [s for s in nodes if not self.is_false(s)] or nodes[:1]
+        if not nodes:
+            return self.false()
+        return self._reduce(self.disjoin2, nodes)
+
+    def _reduce(self, operation, nodes):
+        """Combine the given nodes pairwise in a balanced tree.
+
+        Wide conjunctions and disjunctions build smaller intermediate results this way than by \
+        folding each node into an ever growing accumulator.
+
+        :param operation: binary operation (conjoin2 or disjoin2)
+        :param nodes: non-empty sequence of nodes to combine
+        :return: combination of the given nodes (with a reference for the caller)
+        """
+        level = list(nodes)
+        owned = [False] * len(level)  # whether we hold a reference to the node
+        while len(level) > 1:
+            next_level = []
+            next_owned = []
+            for i in range(0, len(level) - 1, 2):
+                r = operation(level[i], level[i + 1])
+                self.ref(r)
+                if owned[i]:
+                    self.deref(level[i])
+                if owned[i + 1]:
+                    self.deref(level[i + 1])
+                next_level.append(r)
+                next_owned.append(True)
+            if len(level) % 2:
+                next_level.append(level[-1])
+                next_owned.append(owned[-1])
+            level = next_level
+            owned = next_owned
+        if not owned[0]:
+            self.ref(level[0])
+        return level[0]
 
     def equiv(self, node1, node2):
         """Enforce the equivalence between node1 and node2.
@@ -396,10 +436,6 @@ class DDManager(object):
         """
         raise NotImplementedError("abstract method")
 
-    def __del__(self):
-        """Clean up the internal structure."""
-        raise NotImplementedError("abstract method")
-
 
 class DDEvaluator(Evaluator):
     """Generic evaluator for bottom-up compiled decision diagrams.
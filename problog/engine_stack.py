@@ -41,7 +41,7 @@ from .engine import (
     ClauseDBEngine,
     substitute_head_args,
     substitute_call_args,
-    unify_call_head,
+    unify_call_head_args,
     unify_call_return,
     OccursCheck,
     substitute_simple,
@@ -78,6 +78,8 @@ class StackBasedEngine(ClauseDBEngine):
         self.node_types["choice"] = self.eval_choice
         self.node_types["builtin"] = self.eval_builtin
         self.node_types["extern"] = self.eval_extern
+        # Node class => evaluation function, filled from node_types on first use.
+        self._node_dispatch = {}
 
         self.cycle_root = None
         self.pointer = 0
@@ -105,7 +107,12 @@ class StackBasedEngine(ClauseDBEngine):
         database = kwdargs["database"]
 
         # Skip not included or excluded nodes, or if parent is ignoring new results
-        if self.should_skip_node(node_id, **kwdargs):
+        # (only pay for the full check when one of these can apply).
+        if (
+            kwdargs.get("include") is not None
+            or kwdargs.get("exclude") is not None
+            or self.ignoring
+        ) and self.should_skip_node(node_id, **kwdargs):
             return self.skip(node_id, **kwdargs)
 
         if node_id < 0:
@@ -114,14 +121,15 @@ class StackBasedEngine(ClauseDBEngine):
             exec_func = self.eval_builtin
         else:
             node = database.get_node(node_id)
-            node_type = type(node).__name__
-            exec_func = self.create_node_type(node_type)
-
+            exec_func = self._node_dispatch.get(type(node))
             if exec_func is None:
-                if self.unknown == self.UNKNOWN_FAIL:
-                    return self.skip(node_id, **kwdargs)
-                else:
-                    raise UnknownClauseInternal()
+                exec_func = self.create_node_type(type(node).__name__)
+                if exec_func is None:
+                    if self.unknown == self.UNKNOWN_FAIL:
+                        return self.skip(node_id, **kwdargs)
+                    else:
+                        raise UnknownClauseInternal()
+                self._node_dispatch[type(node)] = exec_func
 
         return exec_func(node_id=node_id, node=node, **kwdargs)
 
@@ -218,22 +226,39 @@ class StackBasedEngine(ClauseDBEngine):
         else:
             return MessageFIFO(self)
 
-    def in_cycle(self, pointer):
+    def in_cycle(self, pointer, memo=None):
         """Check whether the node at the given pointer is inside a cycle.
 
         :param pointer:
+        :param memo: results of earlier checks on the current stack (pointer => bool), \
+        used and updated when checking several pointers in a row
         :return:
         """
-        if pointer is None:
-            return False
-        elif self.cycle_root is None:
+        if self.cycle_root is None:
             return False
-        elif pointer == self.cycle_root.pointer:
-            return True
-        else:
+        root = self.cycle_root.pointer
+        # Walk up the ancestors until the answer is known.
+        path = []
+        while True:
+            if pointer is None:
+                res = False
+                break
+            elif pointer == root:
+                res = True
+                break
+            elif memo is not None and pointer in memo:
+                res = memo[pointer]
+                break
             node = self.stack[pointer]
-            res = node.on_cycle or self.in_cycle(node.parent)
-            return res
+            if node.on_cycle:
+                res = True
+                break
+            path.append(pointer)
+            pointer = node.parent
+        if memo is not None:
+            for p in path:
+                memo[p] = res
+        return res
 
     def find_cycle(self, child, parent, force=False):
         root_encountered = None
@@ -612,7 +637,7 @@ class StackBasedEngine(ClauseDBEngine):
     def eval_fact(self, parent, node_id, node, context, target, identifier, **kwdargs):
         try:
             # Verify that fact arguments unify with call arguments.
-            unify_call_head(context, node.args, context)
+            unify_call_head_args(context, node.args, context)
 
             if True or self.label_all:
                 name = Term(node.functor, *node.args)
@@ -799,10 +824,7 @@ class StackBasedEngine(ClauseDBEngine):
         ground_mask = [not is_ground(c) for c in call_args]
 
         def result_transform(result):
-            if hasattr(result, "state"):
-                state1 = result.state
-            else:
-                state1 = None  # TODO: None or empty state? -Vin.
+            state1 = getattr(result, "state", None)  # TODO: None or empty state? -Vin.
 
             output1 = self._clone_context(context, state=state1)
             try:
@@ -865,7 +887,7 @@ class StackBasedEngine(ClauseDBEngine):
 
         try:
             try:
-                unify_call_head(context, node.args, new_context)
+                unify_call_head_args(context, node.args, new_context)
             except OccursCheck as err:
                 raise OccursCheck(location=kwdargs["database"].lineno(node.location))
 
@@ -983,9 +1005,10 @@ class StackBasedEngine(ClauseDBEngine):
 
 
 def get_state(c):
-    if hasattr(c, "state"):
+    # Contexts always carry a state, so try the attribute before probing for it.
+    try:
         return c.state
-    else:
+    except AttributeError:
         return State()
 
 
@@ -1043,6 +1066,8 @@ class State(dict):
 
 
 class Context(list):
+    __slots__ = ("state",)
+
     def __init__(self, parent, state=None):
         list.__init__(self, parent)
         if state is None:
@@ -1060,13 +1085,17 @@ class FixedContext(tuple):
     def __new__(cls, parent):
         n = tuple.__new__(cls, parent)
         n.state = get_state(parent)
+        n.__hash = None
         return n
 
     def __repr__(self):
         return "%s {%s}" % (tuple.__repr__(self), self.state)
 
     def __hash__(self):
-        return tuple.__hash__(self) + hash(self.state)
+        # Fixed contexts are used as result keys and looked up repeatedly: hash them once.
+        if self.__hash is None:
+            self.__hash = tuple.__hash__(self) + hash(self.state)
+        return self.__hash
 
     def __eq__(self, other):
         return tuple.__eq__(self, other) and self.state == get_state(other)
@@ -1144,12 +1173,22 @@ class MessageFIFO(MessageQueue):
         MessageQueue.__init__(self)
         self.engine = engine
         self.messages = []
+        # The debugger is fixed for the lifetime of the queue; look it up only once.
+        self._debugger = engine.debugger
 
     def append(self, message):
         self.messages.append(message)
         # Inform the debugger.
-        if self.engine.debugger:
-            self.engine.debugger.process_message(*message)
+        if self._debugger:
+            self._debugger.process_message(*message)
+
+    def __iadd__(self, messages):
+        if self._debugger:
+            for message in messages:
+                self.append(message)
+        else:
+            self.messages.extend(messages)
+        return self
 
     def pop(self):
         return self.messages.pop(-1)
@@ -1195,9 +1234,11 @@ class MessageAnyOrder(MessageQueue):
         if self.engine.cycle_root is None:
             return False
         else:
-            for message in self:  # TODO cache
+            # Messages share most of their ancestors: remember the nodes already checked.
+            memo = {}
+            for message in self:
                 parent = self._msg_parent(message)
-                if self.engine.in_cycle(parent):
+                if self.engine.in_cycle(parent, memo):
                     return False
             return True
 
@@ -1265,12 +1306,11 @@ class NestedDict(object):
 
     def __getitem__(self, key):
         p_key, s_key = key
-        p_key = (p_key, len(s_key))
-        s_key = list(s_key) + [get_state(s_key)]
-        elem = self.__base[p_key]
+        # Walk the arguments and then the state without building a combined key list.
+        elem = self.__base[(p_key, len(s_key))]
         for s in s_key:
             elem = elem[s]
-        return elem
+        return elem[get_state(s_key)]
 
     def get(self, key, default=None):
         try:
@@ -1279,13 +1319,8 @@ class NestedDict(object):
             return default
 
     def __contains__(self, key):
-        p_key, s_key = key
-        p_key = (p_key, len(s_key))
-        s_key = list(s_key) + [get_state(s_key)]
         try:
-            elem = self.__base[p_key]
-            for s in s_key:
-                elem = elem[s]
+            self[key]
             return True
         except KeyError:
             return False
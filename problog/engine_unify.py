@@ -249,6 +249,15 @@ def substitute_call_args(terms, context, min_var):
     :param context:
     :return:
     """
+    for term in terms:
+        if term is None or type(term) == int:
+            break
+        elif term.probability is not None or not term.is_ground():
+            break
+    else:
+        # All arguments are ground: there is nothing to substitute or translate.
+        return list(terms), {None: None}
+
     result = []
     cw = _ContextWrapper(context, min_var)
     for term in terms:
@@ -299,13 +308,28 @@ def unify_call_head(call_args, head_args, target_context):
     :param target_context: list of values of variables in the clause
     :raise UnifyError: unification failed
     """
+    source_values = unify_call_head_args(call_args, head_args, target_context)
+    result = substitute_all(target_context, source_values)
+    return result
+
+
+def unify_call_head_args(call_args, head_args, target_context):
+    """
+    Unify argument list from clause call and clause head, without building the substituted \
+    clause context.
+    :param call_args: arguments of the call
+    :param head_args: arguments of the head
+    :param target_context: list of values of variables in the clause
+    :return: the values unified to the variables in the call arguments
+    :raise UnifyError: unification failed
+    """
     source_values = (
         {}
     )  # contains the values unified to the variables in the call arguments
+    unify_single = _unify_call_head_single
     for call_arg, head_arg in zip(call_args, head_args):
-        _unify_call_head_single(call_arg, head_arg, target_context, source_values)
-    result = substitute_all(target_context, source_values)
-    return result
+        unify_single(call_arg, head_arg, target_context, source_values)
+    return source_values
 
 
 def _unify_call_head_single(source_value, target_value, target_context, source_values):
@@ -157,6 +157,26 @@ def results_to_actions(
 
 
 class EvalNode(object):
+    # The engine creates one of these per evaluated goal: avoid a __dict__ per instance.
+    __slots__ = (
+        "engine",
+        "database",
+        "target",
+        "node_id",
+        "node",
+        "context",
+        "parent",
+        "identifier",
+        "pointer",
+        "transform",
+        "call",
+        "on_cycle",
+        "current_clause",
+        "include",
+        "exclude",
+        "no_cache",
+    )
+
     def __init__(
         self,
         engine,
@@ -262,6 +282,8 @@ class EvalOr(EvalNode):
     # - 'complete' waits until it is called C times, then sends signal to parent
     # Can be cleanup after 'complete' was sent
 
+    __slots__ = ("results", "to_complete")
+
     def __init__(self, **parent_args):
         EvalNode.__init__(self, **parent_args)
         self.results = ResultSet()
@@ -346,6 +368,19 @@ class EvalOr(EvalNode):
 
 class EvalDefine(EvalNode):
     # A buffered Define node.
+    __slots__ = (
+        "results",
+        "cycle_children",
+        "cycle_close",
+        "is_cycle_root",
+        "is_cycle_child",
+        "is_cycle_parent",
+        "siblings",
+        "to_complete",
+        "is_ground",
+        "is_root",
+    )
+
     def __init__(self, call=None, to_complete=None, is_root=False, **parent_args):
         EvalNode.__init__(self, **parent_args)
         # self.__buffer = defaultdict(list)
@@ -453,11 +488,7 @@ class EvalDefine(EvalNode):
                             (node,), readonly=False, name=name
                         )
                     self.results[res] = result_node
-                    if (
-                        not self.no_cache
-                        and is_ground(*res)
-                        and is_ground(*self.call[1])
-                    ):
+                    if not self.no_cache and self.is_ground and is_ground(*res):
                         self.target._cache[cache_key] = {res: result_node}
                     actions = []
                     # Send results to cycle
@@ -506,7 +537,18 @@ class EvalDefine(EvalNode):
                 self.target._cache.deactivate(cache_key)
                 actions = []
                 if self.is_buffered():
-                    actions = results_to_actions(self.results, **vars(self))
+                    actions = results_to_actions(
+                        self.results,
+                        engine=self.engine,
+                        node=self.node,
+                        context=self.context,
+                        target=self.target,
+                        parent=self.parent,
+                        identifier=self.identifier,
+                        transform=self.transform,
+                        is_root=self.is_root,
+                        database=self.database,
+                    )
 
                     for s in self.siblings:
                         n = len(self.results)
@@ -560,7 +602,7 @@ class EvalDefine(EvalNode):
                         new_nodes.append(node)
                     nodes = new_nodes
                 node = self.target.add_or(nodes, readonly=(not cycle), name=name)
-                if not self.no_cache and is_ground(*res) and is_ground(*self.call[1]):
+                if not self.no_cache and self.is_ground and is_ground(*res):
                     self.target._cache[cache_key] = {res: node}
 
             return node
@@ -708,6 +750,8 @@ class EvalNot(EvalNode):
     # - 'complete: sends out new_results and complete signals
     # Can be cleanup after 'complete' was sent
 
+    __slots__ = ("nodes",)
+
     def __init__(self, **parent_args):
         EvalNode.__init__(self, **parent_args)
         self.nodes = set()  # Store ground nodes
@@ -759,6 +803,8 @@ class EvalNot(EvalNode):
 
 
 class EvalAnd(EvalNode):
+    __slots__ = ("to_complete",)
+
     def __init__(self, **parent_args):
         EvalNode.__init__(self, **parent_args)
         self.to_complete = 1
@@ -831,6 +877,8 @@ class EvalAnd(EvalNode):
 
 
 class EvalBuiltIn(EvalNode):
+    __slots__ = ("location", "call_origin")
+
     def __init__(self, call_origin=None, **kwdargs):
         EvalNode.__init__(self, **kwdargs)
         if call_origin is not None:
@@ -828,26 +828,32 @@ class LogicFormula(BaseFormula):
             if t in content:
                 return t
 
-            # Eliminate unneeded node nodes (false for OR, true for AND)
-            content = filter(lambda x: x != f, content)
-
-            # Put into fixed order and eliminate duplicate nodes
-            if self._keep_duplicates:
-                content = tuple(content)
-            elif self._keep_order:
-                content = tuple(OrderedSet(content))
-            else:  # any_order
-                # can also merge (a, b) and (b, a)
-                content = tuple(OrderedSet(content))
-                # content = tuple(set(content))
-
-            # Empty OR node fails, AND node is true
-            if not content and not placeholder:
-                return f
-
-            # Contains opposites: return 'TRUE' for or, 'FALSE' for and
-            if len(set(content)) > len(set(map(abs, content))):
-                return t
+            if isinstance(content, (tuple, list)) and len(content) == 1:
+                # A single component can be neither duplicated nor opposed: skip the set-based checks.
+                content = tuple(content) if content[0] != f else ()
+                if not content and not placeholder:
+                    return f
+            else:
+                # Eliminate unneeded node nodes (false for OR, true for AND)
+                content = filter(lambda x: x != f, content)
+
+                # Put into fixed order and eliminate duplicate nodes
+                if self._keep_duplicates:
+                    content = tuple(content)
+                elif self._keep_order:
+                    content = tuple(OrderedSet(content))
+                else:  # any_order
+                    # can also merge (a, b) and (b, a)
+                    content = tuple(OrderedSet(content))
+                    # content = tuple(set(content))
+
+                # Empty OR node fails, AND node is true
+                if not content and not placeholder:
+                    return f
+
+                # Contains opposites: return 'TRUE' for or, 'FALSE' for and
+                if len(set(content)) > len(set(map(abs, content))):
+                    return t
 
             # If node has only one child, just return the child.
             # Don't do this for modifiable nodes, we need to keep a separate node.
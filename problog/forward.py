@@ -34,7 +34,7 @@ from .core import transform_create_as
 from .dd_formula import DD
 from .dd_formula import build_dd
 from .evaluator import Evaluator, EvaluatableDSP, InconsistentEvidenceError
-from .formula import LogicFormula, OrderedSet, atom
+from .formula import LogicFormula, OrderedSet, atom, conj, disj
 from .sdd_formula import SDD
 from .util import UHeap
 
@@ -50,6 +50,7 @@ class ForwardInference(DD):
         self._inodes_prev = None
         self._inodes_old = None
         self._inodes_neg = None
+        self._inodes_touched = None
         self._facts = None
         self._atoms_in_rules = None
         self._completed = None
@@ -109,6 +110,7 @@ class ForwardInference(DD):
         self._inodes_prev = [None] * len(self)
         self._inodes_old = [None] * len(self)
         self._inodes_neg = [None] * len(self)
+        self._inodes_touched = set()
         self._compute_minmax_depths()
 
     def _propagate_complete(self, interrupted=False):
@@ -154,8 +156,7 @@ class ForwardInference(DD):
             for index in current_nodes:
                 self._node_depths[index - 1] = current_level
                 node = self.get_node(index)
-                nodetype = type(node).__name__
-                if nodetype != "atom":
+                if type(node) is not atom:
                     for c in node.children:
                         if self.is_probabilistic(c):
                             if self._node_depths[abs(c) - 1] is None:
@@ -177,8 +178,7 @@ class ForwardInference(DD):
                         self._node_minmax[rule - 1] = minmax
                     else:
                         node = self.get_node(rule)
-                        nodetype = type(node).__name__
-                        if nodetype == "conj":
+                        if type(node) is conj:
                             rule_minmax = max(minmax, rule_minmax)
                         else:  # disj
                             rule_minmax = min(minmax, rule_minmax)
@@ -199,7 +199,6 @@ class ForwardInference(DD):
             if current_minmax == parent_minmax:
                 # Current node is best child => we need to recompute
                 parent_node = self.get_node(parent)
-                parent_nodetype = type(parent_node).__name__
                 parent_children_minmax = [
                     self._node_minmax[c - 1]
                     for c in parent_node.children
@@ -209,7 +208,7 @@ class ForwardInference(DD):
                     # No incomplete children
                     self.set_complete(parent)
                     parent_minmax = 0
-                elif parent_nodetype == "conj":
+                elif type(parent_node) is conj:
                     parent_minmax = max(parent_children_minmax)
                 else:
                     parent_minmax = min(parent_children_minmax)
@@ -273,18 +272,24 @@ class ForwardInference(DD):
             updated_nodes = next_updates
 
     def build_stratum(self, updated_nodes):
+        manager = self.get_manager()
         self.build_iteration(updated_nodes)
+        # Only nodes that were set during this stratum can differ from the previous one.
+        touched = sorted(self._inodes_touched)
+        self._inodes_touched = set()
         updated_nodes = OrderedSet()
-        for i, nodes in enumerate(zip(self.inodes, self._inodes_old)):
-            if not self.get_manager().same(*nodes):
-                updated_nodes.add(i + 1)
-                # self.notify_node_updated(i + 1)
-        self.get_manager().ref(*filter(None, self.inodes))
-        self.get_manager().deref(*filter(None, self._inodes_prev))
-        self.get_manager().deref(*filter(None, self._inodes_neg))
-
+        for index in touched:
+            if not manager.same(self.inodes[index - 1], self._inodes_old[index - 1]):
+                updated_nodes.add(index)
+                # self.notify_node_updated(index)
+        manager.ref(*filter(None, self.inodes))
+        manager.deref(*filter(None, self._inodes_prev))
+        manager.deref(*filter(None, self._inodes_neg))
+
+        # Update the snapshot of this stratum in place: the other nodes did not change.
+        for index in touched:
+            self._inodes_old[index - 1] = self.inodes[index - 1]
         # Only completed nodes should be used for negation in the next stratum.
-        self._inodes_old = self.inodes[:]
         self._inodes_prev = [None] * len(self)
         for i, n in enumerate(self.inodes):
             if self._completed[i]:
@@ -360,33 +365,32 @@ class ForwardInference(DD):
     def update_inode(self, index):
         """Recompute the inode at the given index."""
 
+        manager = self.get_manager()
         was_complete = self.is_complete(index)
 
         oldnode = self.get_inode(index)
         node = self.get_node(index)
         assert index > 0
-        nodetype = type(node).__name__
-        if nodetype == "conj":
-            children = [self.get_inode(c) for c in node.children]
-            children_complete = [self.is_complete(c) for c in node.children]
-            if None in children:
+        nodetype = type(node)
+        if nodetype is conj:
+            children, children_complete = self._get_children_inodes(
+                node, require_known=True
+            )
+            if children is None:
                 newnode = None  # don't compute if some children are still unknown
             else:
-                newnode = self.get_manager().conjoin(*children)
-            if False not in children_complete:
+                newnode = manager.conjoin(*children)
+            if children_complete:
                 self.set_complete(index)
 
-        elif nodetype == "disj":
-            children = [self.get_inode(c) for c in node.children]
-            children_complete = [self.is_complete(c) for c in node.children]
-            children = list(
-                filter(None, children)
-            )  # discard children that are still unknown
+        elif nodetype is disj:
+            # discard children that are still unknown
+            children, children_complete = self._get_children_inodes(node)
             if children:
-                newnode = self.get_manager().disjoin(*children)
+                newnode = manager.disjoin(*children)
             else:
                 newnode = None
-            if False not in children_complete:
+            if children_complete:
                 self.set_complete(index)
 
         else:
@@ -394,18 +398,44 @@ class ForwardInference(DD):
 
         # Add constraints
         if newnode is not None:
-            newernode = self.get_manager().conjoin(newnode, self.get_constraint_inode())
-            self.get_manager().deref(newnode)
+            newernode = manager.conjoin(newnode, self.get_constraint_inode())
+            manager.deref(newnode)
             newnode = newernode
 
-        if self.get_manager().same(oldnode, newnode):
+        if manager.same(oldnode, newnode):
             return self.is_complete(index) != was_complete  # no change occurred
         else:
             if oldnode is not None:
-                self.get_manager().deref(oldnode)
+                manager.deref(oldnode)
             self.set_inode(index, newnode)
             return True
 
+    def _get_children_inodes(self, node, require_known=False):
+        """Collect the internal nodes of the children of the given compound node.
+
+        Children that are not yet known are left out.
+
+        :param node: conjunction or disjunction
+        :param require_known: stop collecting at the first child that is not yet known and \
+        return None instead of the list
+        :return: list of internal nodes of the children and whether all children are complete
+        """
+        get_inode = self.get_inode
+        is_complete = self.is_complete
+        children = []
+        complete = True
+        for c in node.children:
+            if children is not None:
+                inode = get_inode(c)
+                if inode is not None:
+                    children.append(inode)
+                elif require_known:
+                    children = None
+            complete = complete and is_complete(c)
+            if children is None and not complete:
+                break
+        return children, complete
+
     def get_evidence_inode(self):
         if not self.is_probabilistic(self.evidence_node):
             return self.get_manager().true()
@@ -424,27 +454,28 @@ class ForwardInference(DD):
         :rtype: SDDNode
         """
         assert self.is_probabilistic(index)
+        manager = self.get_manager()
         node = self.get_node(abs(index))
-        if type(node).__name__ == "atom":
+        if type(node) is atom:
             av = self.atom2var.get(abs(index))
             if av is None:
-                av = self.get_manager().add_variable()
+                av = manager.add_variable()
                 self.atom2var[abs(index)] = av
                 self.var2atom[av] = abs(index)
-            result = self.get_manager().literal(av)
+            result = manager.literal(av)
             if index < 0:
-                return self.get_manager().negate(result)
+                return manager.negate(result)
             else:
                 return result
         elif index < 0 and not final:
             # We are requesting a negated node => use previous stratum's result
             result = self._inodes_neg[-index - 1]
             if result is None and self._inodes_prev[-index - 1] is not None:
-                result = self.get_manager().negate(self._inodes_prev[-index - 1])
+                result = manager.negate(self._inodes_prev[-index - 1])
                 self._inodes_neg[-index - 1] = result
             return result
         elif index < 0:
-            return self.get_manager().negate(self.inodes[-index - 1])
+            return manager.negate(self.inodes[-index - 1])
         else:
             return self.inodes[index - 1]
 
@@ -458,6 +489,7 @@ class ForwardInference(DD):
         assert index is not None
         assert index > 0
         self.inodes[index - 1] = node
+        self._inodes_touched.add(index)
 
     def add_constraint(self, c):
         LogicFormula.add_constraint(self, c)
@@ -727,8 +759,7 @@ class ForwardEvaluator(Evaluator):
                 return self.semiring.result(result, self.formula)
         else:
             n = self.formula.get_node(abs(index))
-            nt = type(n).__name__
-            if nt == "atom":
+            if type(n) is atom:
                 wp = self._results[index]
                 # wp, wn = self.weights.get(abs(index))
                 if index < 0:
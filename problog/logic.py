@@ -158,6 +158,21 @@ def is_ground(*terms):
     return True
 
 
+def _same_args(new_args, args):
+    """Test whether the given arguments are the same objects as the original arguments.
+
+    :param new_args: list of rebuilt arguments
+    :param args: tuple of original arguments
+    :return: True if each rebuilt argument is identical to the original one
+    """
+    if len(new_args) != len(args):
+        return False
+    for a, b in zip(new_args, args):
+        if a is not b:
+            return False
+    return True
+
+
 def is_variable(term):
     """Test whether a Term represents a variable.
 
@@ -249,7 +264,9 @@ class Term(object):
         """Term's signature ``functor/arity``"""
         if self.__signature is None:
             functor = str(self.functor)
-            self.__signature = "%s/%s" % (functor.strip("'"), self.arity)
+            # Interned, so that lookups of clause heads and builtins by signature
+            # can short-circuit on identity.
+            self.__signature = sys.intern("%s/%s" % (functor.strip("'"), self.arity))
         return self.__signature
 
     def apply(self, subst):
@@ -301,7 +318,15 @@ class Term(object):
                 new_args = new_stack.pop(-1)
                 term = term_stack.pop(-1)
                 if term.probability is not None:
-                    new_term = term.with_args(*new_args[:-1], p=new_args[-1])
+                    if new_args[-1] is term.probability and _same_args(
+                        new_args[:-1], term.args
+                    ):
+                        # Nothing was substituted: reuse the term instead of rebuilding it.
+                        new_term = term
+                    else:
+                        new_term = term.with_args(*new_args[:-1], p=new_args[-1])
+                elif _same_args(new_args, term.args):
+                    new_term = term
                 else:
                     new_term = term.with_args(*new_args)
                 if new_stack:
@@ -817,11 +817,6 @@ class SDDManager(DDManager):
             nodes_cache[node.id] = or_node
             return or_node
 
-    def __del__(self):
-        # if sdd is not None and sdd.sdd_manager_free is not None:
-        #     sdd.sdd_manager_free(self.__manager)
-        self.__manager = None
-
     def __getstate__(self):
         tempfile = mktempfile()
         vtree = self.get_manager().vtree()  # not a copy
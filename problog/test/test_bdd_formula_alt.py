@@ -0,0 +1,118 @@
+"""
+Part of the ProbLog distribution.
+
+Copyright 2015 KU Leuven, DTAI Research Group
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import unittest
+
+from problog.errors import InvalidValue
+from problog.evaluator import SemiringProbability, SemiringLogProbability
+from problog.formula import LogicDAG
+from problog.logic import Term
+from problog.program import PrologString
+
+# noinspection PyBroadException
+try:
+    from problog.bdd_formula_alt import BDD, BDDManager
+
+    has_bdd = BDD.is_available()
+except Exception:
+    has_bdd = False
+
+
+@unittest.skipUnless(has_bdd, "The dd library is not available.")
+class TestBDDFormulaAlt(unittest.TestCase):
+    program = """
+        0.3::a. 0.6::b. 0.2::d.
+        c :- a.
+        c :- \\+b, d.
+        e :- a, b.
+        e :- \\+a, d.
+        evidence(c).
+        query(a). query(e).
+    """
+
+    def test_evaluate(self):
+        """Weighted model counting on the BDD, with evidence and negation."""
+        # P(c) = 0.3 + 0.7 * 0.4 * 0.2 = 0.356
+        expected = {"a": 0.3 / 0.356, "e": (0.3 * 0.6 + 0.7 * 0.4 * 0.2) / 0.356}
+        formula = BDD.create_from(PrologString(self.program))
+        for semiring in (SemiringProbability(), SemiringLogProbability()):
+            with self.subTest(semiring=type(semiring).__name__):
+                result = formula.evaluate(semiring=semiring)
+                result = {str(k): v for k, v in result.items()}
+                self.assertEqual(set(expected), set(result))
+                for k in expected:
+                    self.assertAlmostEqual(expected[k], result[k])
+
+    def test_evaluate_fact(self):
+        """The weight of a fact given the evidence is computed with a cofactor."""
+        formula = BDD.create_from(PrologString(self.program))
+        evaluator = formula.get_evaluator(semiring=SemiringProbability())
+        self.assertAlmostEqual(
+            0.3 / 0.356, evaluator.evaluate_fact(formula.get_node_by_name(Term("a")))
+        )
+        # P(b | c) = (0.3 * 0.6) / 0.356
+        self.assertAlmostEqual(
+            0.18 / 0.356, evaluator.evaluate_fact(formula.get_node_by_name(Term("b")))
+        )
+
+    def test_variable_order(self):
+        """Variables follow the given atom order, or by default keep atoms that occur together adjacent."""
+        # (x0 & y0) | ... | (x7 & y7), with all x_i declared before the y_i
+        dag = LogicDAG()
+        xs = [dag.add_atom(Term("x%d" % i), 0.5) for i in range(8)]
+        ys = [dag.add_atom(Term("y%d" % i), 0.3) for i in range(8)]
+        dag.add_name(
+            Term("q"), dag.add_or([dag.add_and(c) for c in zip(xs, ys)]), dag.LABEL_QUERY
+        )
+        interleaved = [a for c in zip(xs, ys) for a in c]
+        custom = ys[::-1] + xs[:1]
+        expected = 1 - (1 - 0.5 * 0.3) ** 8
+        for var_order, atoms in (
+            (None, interleaved),
+            ([], xs + ys),
+            (custom, custom + xs[1:]),
+        ):
+            with self.subTest(var_order=var_order):
+                formula = BDD.create_from(dag, var_order=var_order)
+                manager = formula.get_manager()
+                levels = manager.base.var_levels
+                order = sorted(levels, key=levels.get)
+                self.assertEqual(
+                    atoms, [formula.var2atom[manager.var2label[v]] for v in order]
+                )
+                result = formula.evaluate(semiring=SemiringProbability())
+                self.assertAlmostEqual(expected, result[Term("q")])
+        with self.assertRaises(InvalidValue):
+            BDD.create_from(dag, var_order=[xs[0], len(dag)])
+
+    def test_reference_counting(self):
+        """Operations leave only their result pinned, for the caller to release."""
+        manager = BDDManager()
+        a, b, c, d = (manager.literal(manager.add_variable()) for _ in range(4))
+        conj = manager.conjoin(a, b, c, d)
+        disj = manager.disjoin(conj, manager.negate(a), b)
+        equiv = manager.equiv(c, d)
+        self.assertEqual({conj: 1, disj: 1, equiv: 1}, manager._pinned)
+        manager.ref(conj)
+        manager.deref(conj, disj, equiv)
+        self.assertEqual({conj: 1}, manager._pinned)
+        manager.deref(conj, conj)
+        self.assertEqual({}, manager._pinned)
+
+
+if __name__ == "__main__":
+    unittest.main()
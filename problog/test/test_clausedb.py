@@ -0,0 +1,126 @@
+"""
+Part of the ProbLog distribution.
+
+Copyright 2015 KU Leuven, DTAI Research Group
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from problog.clausedb import ClauseDB
+from problog.logic import Term
+from problog.program import PrologString
+
+
+class TestClauseDB(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, name):
+        with open(os.path.join(self.tmpdir, name), "w") as f:
+            f.write("\n")
+
+    def test_resolve_filename_after_miss(self):
+        """A source file created after a failed lookup is found."""
+        db = ClauseDB()
+        db.source_root = self.tmpdir
+        path = os.path.join(self.tmpdir, "lib")
+        self.assertEqual(path, db.resolve_filename(Term("lib")))
+        self._write("lib.pl")
+        self.assertEqual(path + ".pl", db.resolve_filename(Term("lib")))
+
+    def test_resolve_filename_priority(self):
+        """A file without extension takes priority over a .pl file, also when created later."""
+        self._write("lib.pl")
+        db = ClauseDB()
+        db.source_root = self.tmpdir
+        path = os.path.join(self.tmpdir, "lib")
+        self.assertEqual(path + ".pl", db.resolve_filename(Term("lib")))
+        self._write("lib")
+        db = ClauseDB()
+        db.source_root = self.tmpdir
+        self.assertEqual(path, db.resolve_filename(Term("lib")))
+
+    def test_resolve_filename_relative(self):
+        """Relative paths are resolved against the current working directory."""
+        other = os.path.join(self.tmpdir, "other")
+        os.mkdir(other)
+        self._write("lib.py")
+        db = ClauseDB()
+        db.source_root = ""
+        cwd = os.getcwd()
+        try:
+            os.chdir(self.tmpdir)
+            self.assertEqual("lib.py", db.resolve_filename(Term("lib")))
+            os.chdir(other)
+            self.assertEqual("lib", db.resolve_filename(Term("lib")))
+        finally:
+            os.chdir(cwd)
+
+
+class TestClauseIndex(unittest.TestCase):
+    def setUp(self):
+        db = ClauseDB.createFrom(
+            PrologString(
+                """
+                p(a, b).
+                p(X, b) :- q(X).
+                p(a, Y) :- q(Y).
+                p(c, b).
+                p(X, Y) :- q(X), q(Y).
+                p(a, c).
+                q(a).
+                """
+            )
+        )
+        self.db = db
+        self.index = db.get_node(db.find(Term("p", None, None))).children
+        self.clauses = list(self.index)
+
+    def test_find_order(self):
+        """Clauses matching several ground arguments are returned in clause order."""
+        c = self.clauses
+        result = self.index.find((Term("a"), Term("b")))
+        self.assertEqual([c[0], c[1], c[2], c[4]], list(result))
+        result = self.index.find((Term("c"), Term("b")))
+        self.assertEqual([c[1], c[3], c[4]], list(result))
+
+    def test_find_erased(self):
+        """Erased clauses are not returned."""
+        c = self.clauses
+        self.index.erase([c[1], c[4]])
+        result = self.index.find((Term("a"), Term("b")))
+        self.assertEqual([c[0], c[2]], list(result))
+        self.assertEqual([c[0], c[2], c[3], c[5]], list(self.index.find((None, None))))
+
+    def test_find_cache(self):
+        """Cached lookups reflect clauses that are added or erased later."""
+        c = self.clauses
+        args = (Term("a"), Term("b"))
+        self.assertEqual([c[0], c[1], c[2], c[4]], list(self.index.find(args)))
+
+        node = self.db.add_fact(Term("p", Term("a"), Term("b")))
+        self.assertEqual([c[0], c[1], c[2], c[4], node], list(self.index.find(args)))
+
+        self.index.erase([c[2]])
+        self.assertEqual([c[0], c[1], c[4], node], list(self.index.find(args)))
+
+
+if __name__ == "__main__":
+    unittest.main()
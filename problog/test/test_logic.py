@@ -149,3 +149,10 @@ class TestLogic(unittest.TestCase):
         self.assertTrue(c4 == c5)
         self.assertFalse(c4 == c6)
         self.assertFalse(c4 == c7)
+
+    def test_apply(self):
+        ground = Term("g", Term("a"))
+        t = Term("f", ground, Term("h", Var("X")))
+        r = t.apply({"X": Term("b")})
+        self.assertEqual(Term("f", Term("g", Term("a")), Term("h", Term("b"))), r)
+        self.assertIs(ground, r.args[0])
@@ -0,0 +1,9 @@
+%Expected outcome:
+% q(2) 1
+
+p(1).
+p(2).
+
+q(N) :- findall(_, p(_), L), length(L, N).
+
+query(q(_)).